@@ -2,6 +2,19 @@ import os
 import cv2
 import numpy as np
 import random
+import q15_io
+
+def pick_random_png(directory):
+    """Pick a random .png file name from a directory without listing it in memory."""
+    # Reservoir sampling over the directory entries (None if there are no images)
+    count, chosen = 0, None
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith('.png'):
+                count += 1
+                if random.randrange(count) == 0:
+                    chosen = entry.name
+    return chosen
 
 def convert_image_to_hex(image_path, output_path, target_size=(60, 60)):
     """Convert an image to grayscale, resize it, and save as hex values."""
@@ -16,11 +29,7 @@ def convert_image_to_hex(image_path, output_path, target_size=(60, 60)):
     img = cv2.resize(img, target_size)
     
     # Write to hex file
-    with open(output_path, 'w') as f:
-        for y in range(target_size[1]):
-            for x in range(target_size[0]):
-                # Write as 2-digit hex values
-                f.write(f"{img[y, x]:02x}\n")
+    q15_io.write_hex(output_path, img)
     
     print(f"Converted {image_path} to {output_path}")
     return True
@@ -51,11 +60,7 @@ def create_synthetic_image(shape_type, output_path, size=60):
         cv2.fillPoly(img, [pts], 255)
     
     # Write to hex file
-    with open(output_path, 'w') as f:
-        for y in range(size):
-            for x in range(size):
-                # Write as 2-digit hex values
-                f.write(f"{img[y, x]:02x}\n")
+    q15_io.write_hex(output_path, img)
     
     print(f"Created synthetic {shape_type} image at {output_path}")
     return True
@@ -94,16 +99,14 @@ def main():
             create_synthetic_image(shape, os.path.join(output_dir, f"{shape}_image.hex"))
             continue
         
-        # Get all image files in this shape directory
-        image_files = [f for f in os.listdir(shape_dir) if f.endswith('.png')]
+        # Select a random image from this shape
+        random_image = pick_random_png(shape_dir)
         
-        if not image_files:
+        if random_image is None:
             print(f"No images found in {shape_dir}")
             create_synthetic_image(shape, os.path.join(output_dir, f"{shape}_image.hex"))
             continue
         
-        # Select a random image from this shape
-        random_image = random.choice(image_files)
         image_path = os.path.join(shape_dir, random_image)
         output_path = os.path.join(output_dir, f"{shape}_image.hex")
         
@@ -112,9 +115,8 @@ def main():
     # For the custom image, select another random image (e.g., from circle)
     circle_dir = os.path.join(dataset_dir, "circle")
     if os.path.exists(circle_dir):
-        image_files = [f for f in os.listdir(circle_dir) if f.endswith('.png')]
-        if image_files:
-            random_image = random.choice(image_files)
+        random_image = pick_random_png(circle_dir)
+        if random_image is not None:
             image_path = os.path.join(circle_dir, random_image)
             output_path = os.path.join(output_dir, "custom_image.hex")
             convert_image_to_hex(image_path, output_path)
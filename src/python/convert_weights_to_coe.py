@@ -3,43 +3,61 @@ import tensorflow as tf
 from tensorflow import keras
 import os
 import struct
+import sys
+import q15_io
 
-def float_to_fixed_point(val, int_bits=1, frac_bits=15):
-    """Convert floating point value to Q1.15 fixed point format."""
-    # Q1.15 format range: [-1, 0.99997]
-    # Clamp values to the range
-    val = max(min(val, 1.0 - 2**(-frac_bits)), -1.0)
-    
-    # Scale the value to fixed point
-    scaled_val = int(val * (2**frac_bits))
-    
-    # Handle negative numbers (two's complement)
-    if scaled_val < 0:
-        scaled_val = (1 << (int_bits + frac_bits)) + scaled_val
-    
-    return scaled_val
-
-def generate_coe_file(weights, filename, int_bits=1, frac_bits=15):
+def generate_coe_file(weights, filename):
     """Generate COE file for Vivado BRAM IP core."""
-    with open(filename, 'w') as f:
-        # Write COE file header
-        f.write("memory_initialization_radix=16;\n")
-        f.write("memory_initialization_vector=\n")
-        
-        # Convert each weight to fixed point and write as hex
-        weights_flat = weights.flatten()
-        for i, weight in enumerate(weights_flat):
-            fixed_point = float_to_fixed_point(weight, int_bits, frac_bits)
-            hex_val = format(fixed_point & 0xFFFF, '04x')  # 16-bit hex representation
-            
-            if i < len(weights_flat) - 1:
-                f.write(f"{hex_val},\n")
-            else:
-                f.write(f"{hex_val};\n")
+    # Convert all weights to Q1.15 fixed point in one pass
+    q15_io.write_coe(filename, q15_io.to_q15(weights))
     
     print(f"Generated COE file: {filename}")
 
-def main():
+def quantize_int8(weights, per_channel=False):
+    """Symmetric int8 quantization with a per-tensor or per-output-neuron scale."""
+    # Dense kernels are (inputs, outputs), so per-channel reduces every axis but the last
+    if per_channel:
+        max_abs = np.max(np.abs(weights), axis=tuple(range(weights.ndim - 1)))
+    else:
+        max_abs = np.max(np.abs(weights))
+    
+    # Guard against all-zero tensors/channels
+    scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    
+    quantized = np.clip(np.rint(weights / scale), -128, 127).astype(np.int8)
+    return quantized, scale
+
+def quantize_bias_int32(biases, weight_scale, frac_bits=15):
+    """Quantize biases to int32 in the accumulator scale of an int8 layer."""
+    # Activations stay in Q1.15, so the input scale is 2^-frac_bits
+    scaled = np.rint(biases / (weight_scale * 2.0**(-frac_bits)))
+    
+    # A tiny per-channel weight scale can push a bias past the int32 range
+    info = np.iinfo(np.int32)
+    overflow = (scaled < info.min) | (scaled > info.max)
+    if np.any(overflow):
+        print(f"Warning: clipping {np.count_nonzero(overflow)} bias value(s) to the int32 range")
+    
+    return np.clip(scaled, info.min, info.max).astype(np.int32)
+
+def generate_int8_coe_files(weights, biases, weights_filename, biases_filename, per_channel=False):
+    """Generate int8 weight and int32 bias COE files plus a companion scale file."""
+    weights_q, scale = quantize_int8(weights, per_channel)
+    biases_q = quantize_bias_int32(biases, scale)
+    
+    # Weights as 8-bit and biases as 32-bit two's complement hex
+    q15_io.write_coe(weights_filename, weights_q)
+    q15_io.write_coe(biases_filename, biases_q)
+    
+    # Scale(s) needed to dequantize: real = q * scale
+    scale_filename = os.path.splitext(weights_filename)[0] + '_scale.txt'
+    with open(scale_filename, 'w') as f:
+        f.write('\n'.join(f"{s:.9g}" for s in np.atleast_1d(scale).tolist()) + '\n')
+    
+    print(f"Generated int8 COE files: {weights_filename}, {biases_filename}")
+    return weights_q.size + 4 * biases_q.size
+
+def main(export_int8=False):
     # Load the model
     model_path = '/Users/sachith/Desktop/archive/shapes_model.h5'
     
@@ -88,8 +106,9 @@ def main():
     # Only keep weights for circle, square, and triangle (exclude star)
     # Assuming the order is [triangle, star, square, circle] from make_model.py
     # We want [circle, square, triangle]
-    output_weights_filtered = np.vstack([output_weights[:, 3], output_weights[:, 2], output_weights[:, 0]]).T
-    output_biases_filtered = np.array([output_biases[3], output_biases[2], output_biases[0]])
+    keep = [3, 2, 0]
+    output_weights_filtered = np.ascontiguousarray(output_weights[:, keep])
+    output_biases_filtered = output_biases[keep]
     
     # Generate COE files
     generate_coe_file(layer1_weights, f"{output_dir}/layer1_weights.coe")
@@ -122,6 +141,25 @@ def main():
     bram_bytes = total_weights * 2  # 2 bytes per 16-bit value
     print(f"\nTotal number of parameters: {total_weights}")
     print(f"Total BRAM requirement: {bram_bytes} bytes ({bram_bytes/1024:.2f} KB)")
+    
+    # Optional int8 export (int8 weights, int32 biases, per-output-neuron scales)
+    if export_int8:
+        int8_dir = f"{output_dir}/int8"
+        os.makedirs(int8_dir, exist_ok=True)
+        
+        layers = [
+            ("layer1", layer1_weights, layer1_biases),
+            ("layer2", layer2_weights, layer2_biases),
+            ("layer3", layer3_weights, layer3_biases),
+            ("output", output_weights_filtered, output_biases_filtered),
+        ]
+        int8_bram_bytes = 0
+        for name, w, b in layers:
+            int8_bram_bytes += generate_int8_coe_files(
+                w, b, f"{int8_dir}/{name}_weights.coe", f"{int8_dir}/{name}_biases.coe",
+                per_channel=True)
+        
+        print(f"Total int8 BRAM requirement: {int8_bram_bytes} bytes ({int8_bram_bytes/1024:.2f} KB)")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main(export_int8='--int8' in sys.argv[1:]) 
\ No newline at end of file
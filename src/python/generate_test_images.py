@@ -3,6 +3,8 @@
 
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
+import q15_io
 
 def generate_circle_image(size=60, radius=25):
     """Generate a binary circle image"""
@@ -25,46 +27,50 @@ def generate_triangle_image(size=60):
     """Generate a binary triangle image"""
     img = np.zeros((size, size), dtype=np.uint8)
     height = size * 2 // 3
-    for y in range(size):
-        for x in range(size):
-            # Equilateral triangle centered in the image
-            if (y >= size//3 and 
-                x >= size//2 - (y - size//3) and 
-                x <= size//2 + (y - size//3) and
-                y <= size//3 + height):
-                img[y, x] = 255
+    y, x = np.ogrid[:size, :size]
+    # Equilateral triangle centered in the image
+    mask = ((y >= size//3) &
+            (x >= size//2 - (y - size//3)) &
+            (x <= size//2 + (y - size//3)) &
+            (y <= size//3 + height))
+    img[mask] = 255
     return img
 
 def generate_custom_image(size=60):
     """Generate a custom test pattern (checkerboard)"""
     img = np.zeros((size, size), dtype=np.uint8)
     check_size = size // 10
-    for i in range(0, size, check_size):
-        for j in range(0, size, check_size):
-            if ((i // check_size) + (j // check_size)) % 2 == 0:
-                img[i:i+check_size, j:j+check_size] = 255
+    y, x = np.indices((size, size))
+    img[((y // check_size + x // check_size) & 1) == 0] = 255
     return img
 
 def save_as_hex(img, filename):
     """Save image as hex file"""
-    with open(filename, 'w') as f:
-        for row in img:
-            for pixel in row:
-                f.write(f"{pixel:02x}\n")
+    q15_io.write_hex(filename, img)
     print(f"Generated {filename}")
 
+def _gen_and_save(generator, filename):
+    """Generate one image and save it as a hex file (without logging)"""
+    q15_io.write_hex(filename, generator())
+
 def main():
-    # Generate the images
-    circle = generate_circle_image()
-    square = generate_square_image()
-    triangle = generate_triangle_image()
-    custom = generate_custom_image()
+    jobs = [
+        (generate_circle_image, "circle_image.hex"),
+        (generate_square_image, "square_image.hex"),
+        (generate_triangle_image, "triangle_image.hex"),
+        (generate_custom_image, "custom_image.hex"),
+    ]
+    
+    # The images are independent, so generate and save them concurrently
+    futures = []
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        for generator, filename in jobs:
+            futures.append((filename, executor.submit(_gen_and_save, generator, filename)))
     
-    # Save as hex files
-    save_as_hex(circle, "circle_image.hex")
-    save_as_hex(square, "square_image.hex")
-    save_as_hex(triangle, "triangle_image.hex")
-    save_as_hex(custom, "custom_image.hex")
+    # Surface any errors and log in job order from the main thread
+    for filename, future in futures:
+        future.result()
+        print(f"Generated {filename}")
     
     print("All test images generated successfully.")
 
@@ -0,0 +1,35 @@
+import numpy as np
+
+# Shared Q1.15 fixed-point conversion and BRAM init file writers
+
+COE_HEADER = b"memory_initialization_radix=16;\nmemory_initialization_vector=\n"
+
+def to_q15(arr):
+    """Convert a float array to flattened Q1.15 fixed point (two's complement uint16)."""
+    # Multiply by 2^15 into a single scratch buffer; scaling by a power of two
+    # is exact, so clamping afterwards matches the Q1.15 range [-1, 1-2^-15]
+    scaled = np.multiply(np.ravel(arr), 1 << 15, dtype=np.float64)
+    np.clip(scaled, -(1 << 15), (1 << 15) - 1, out=scaled)
+    # Round to nearest (ties to even); convert_weights_to_coe.py used to
+    # truncate toward zero, so regenerated COEs can differ by 1 LSB
+    np.rint(scaled, out=scaled)
+
+    # Viewing int16 as uint16 gives the two's complement encoding
+    return scaled.astype(np.int16).view(np.uint16)
+
+def _to_hex(values, sep):
+    """Hex-encode an integer array, one 2*itemsize-digit value per separator."""
+    # Big-endian bytes give MSB-first digits
+    values = np.ravel(values).astype(values.dtype.newbyteorder('>'))
+    return values.tobytes().hex(sep, values.itemsize).encode('ascii')
+
+def write_hex(path, values):
+    """Write an integer array as one hex value per line."""
+    with open(path, 'wb') as f:
+        f.write(_to_hex(values, '\n') + b'\n')
+
+def write_coe(path, values):
+    """Write an integer array as a COE vector for the Vivado Block Memory Generator."""
+    body = _to_hex(values, ',').replace(b',', b',\n')
+    with open(path, 'wb') as f:
+        f.write(COE_HEADER + body + b';\n')
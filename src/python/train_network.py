@@ -1,16 +1,25 @@
 import cv2
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, Dropout
 from tensorflow.keras.utils import to_categorical
+from tensorflow.keras import mixed_precision
 import matplotlib.pyplot as plt
+import q15_io
 
 # Parameters
 img_size = 60  # Size of images for neural network (60x60)
 data_dir = os.path.expanduser('~/Desktop/archive/shapes')
 output_dir = os.path.expanduser('~/shape_detector_project/weights')
+cache_path = os.path.expanduser('~/shape_detector_project/cache.npz')  # Decoded dataset cache
+
+# Use mixed precision on GPUs (float16 compute, float32 variables)
+# CPUs gain little from it, so keep float32 there
+if tf.config.list_physical_devices('GPU'):
+    mixed_precision.set_global_policy('mixed_float16')
 
 # Create output directory if it doesn't exist
 if not os.path.exists(output_dir):
@@ -18,76 +27,38 @@ if not os.path.exists(output_dir):
 
 # Function to flatten image data
 def flatten(dimData, images):
-    images = np.array(images)
-    images = images.reshape(len(images), dimData)
-    images = images.astype('float32')
-    images /= 255
-    return images
+    images = np.asarray(images)
+    # Cast and scale to [0, 1] in a single pass
+    return np.multiply(images.reshape(len(images), dimData), np.float32(1.0 / 255.0),
+                       dtype=np.float32)
 
 # Function to convert and save weights to Q1.15 fixed-point format
 def save_weights_for_fpga(model, output_dir):
     weights = model.get_weights()
     
-    # Create hex files for each layer's weights and biases
-    for i, w in enumerate(weights[::2]):  # Get weights (every other item, skipping biases)
-        layer_name = f"layer{i+1}"
-        print(f"Processing {layer_name} weights, shape: {w.shape}")
-        
-        # Convert to Q1.15 fixed-point (1 sign bit, 15 fractional bits)
-        # Range: [-1, 1-2^-15] ~= [-1, 0.99997]
-        w_fixed = np.clip(w, -1.0, 0.99997)
-        w_int = np.round(w_fixed * 32768).astype(np.int32)  # Multiply by 2^15
-        
-        # Save as hex file
-        with open(f"{output_dir}/{layer_name}_weights.hex", 'w') as f:
-            for weight in w_int.flatten():
-                # Handle negative numbers with 2's complement
-                if weight < 0:
-                    weight = weight + 65536  # 2^16
-                hex_val = format(weight & 0xFFFF, '04x')
-                f.write(f"{hex_val}\n")
-        
-        # Also save as COE file
-        with open(f"{output_dir}/{layer_name}_weights.coe", 'w') as f:
-            f.write("memory_initialization_radix=16;\n")
-            f.write("memory_initialization_vector=\n")
-            weights_hex = []
-            for weight in w_int.flatten():
-                if weight < 0:
-                    weight = weight + 65536  # 2^16
-                hex_val = format(weight & 0xFFFF, '04x')
-                weights_hex.append(hex_val)
-            f.write(',\n'.join(weights_hex) + ';')
-    
-    # Save biases
-    for i, b in enumerate(weights[1::2]):  # Get biases (every other item, starting from second)
-        layer_name = f"layer{i+1}"
-        print(f"Processing {layer_name} biases, shape: {b.shape}")
+    def save_tensor(name, arr):
+        # Convert to Q1.15 fixed-point (1 sign bit, 15 fractional bits) once
+        # and reuse the buffer for both the hex file and the COE file
+        arr_q15 = q15_io.to_q15(arr)
+        q15_io.write_hex(f"{output_dir}/{name}.hex", arr_q15)
+        q15_io.write_coe(f"{output_dir}/{name}.coe", arr_q15)
+    
+    # Create hex and COE files for each layer's weights and biases in parallel
+    futures = []
+    with ThreadPoolExecutor() as executor:
+        for i, w in enumerate(weights[::2]):  # Get weights (every other item, skipping biases)
+            layer_name = f"layer{i+1}"
+            print(f"Processing {layer_name} weights, shape: {w.shape}")
+            futures.append(executor.submit(save_tensor, f"{layer_name}_weights", w))
         
-        # Convert to Q1.15 fixed-point
-        b_fixed = np.clip(b, -1.0, 0.99997)
-        b_int = np.round(b_fixed * 32768).astype(np.int32)  # Multiply by 2^15
-        
-        # Save as hex file
-        with open(f"{output_dir}/{layer_name}_biases.hex", 'w') as f:
-            for bias in b_int.flatten():
-                # Handle negative numbers with 2's complement
-                if bias < 0:
-                    bias = bias + 65536  # 2^16
-                hex_val = format(bias & 0xFFFF, '04x')
-                f.write(f"{hex_val}\n")
-        
-        # Also save as COE file
-        with open(f"{output_dir}/{layer_name}_biases.coe", 'w') as f:
-            f.write("memory_initialization_radix=16;\n")
-            f.write("memory_initialization_vector=\n")
-            biases_hex = []
-            for bias in b_int.flatten():
-                if bias < 0:
-                    bias = bias + 65536  # 2^16
-                hex_val = format(bias & 0xFFFF, '04x')
-                biases_hex.append(hex_val)
-            f.write(',\n'.join(biases_hex) + ';')
+        for i, b in enumerate(weights[1::2]):  # Get biases (every other item, starting from second)
+            layer_name = f"layer{i+1}"
+            print(f"Processing {layer_name} biases, shape: {b.shape}")
+            futures.append(executor.submit(save_tensor, f"{layer_name}_biases", b))
+    
+    # Surface any write errors
+    for future in futures:
+        future.result()
     
     # Save summary data (layer sizes, total weights)
     with open(f"{output_dir}/network_summary.txt", 'w') as f:
@@ -104,15 +75,49 @@ def save_weights_for_fpga(model, output_dir):
         f.write(f"Total biases: {sum(b.size for b in weights[1::2])} parameters\n")
         f.write(f"Total parameters: {sum(w.size for w in weights)} parameters\n")
 
+# Decode and resize images into a preallocated array
+def load_images(paths, path_labels):
+    # Preallocate the output arrays and decode images in parallel
+    # (OpenCV releases the GIL while reading and resizing)
+    images = np.empty((len(paths), img_size, img_size), dtype=np.uint8)
+    labels = np.array(path_labels, dtype=np.int32)
+    loaded = np.zeros(len(paths), dtype=bool)
+    
+    def load(i, img_path):
+        try:
+            # Default interpolation matches convert_images_to_hex.py
+            images[i] = cv2.resize(cv2.imread(img_path, cv2.IMREAD_GRAYSCALE),
+                                   (img_size, img_size))
+            loaded[i] = True
+        except Exception as e:
+            print(f"Error loading {img_path}: {e}")
+    
+    # Run OpenCV single-threaded inside the pool so workers do not each
+    # start a full-width OpenCV thread pool for a tiny resize
+    num_threads = cv2.getNumThreads()
+    cv2.setNumThreads(1)
+    try:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            wait([executor.submit(load, i, path) for i, path in enumerate(paths)])
+    finally:
+        cv2.setNumThreads(num_threads)
+    
+    # Drop any images that failed to load
+    if not loaded.all():
+        images = images[loaded]
+        labels = labels[loaded]
+    
+    return images, labels
+
 # Load and prepare data
 def prepare_data():
     print("Loading data from", data_dir)
     
     # We'll use only circle, square, and triangle for FPGA implementation
     folders = ['circle', 'square', 'triangle']
-    images, labels = [], []
+    paths, path_labels = [], []
     
-    # Load data from each folder
+    # Collect image paths from each folder
     for label, folder in enumerate(folders):
         folder_path = os.path.join(data_dir, folder)
         print(f"Processing {folder} (label {label}) from {folder_path}")
@@ -123,18 +128,21 @@ def prepare_data():
         
         for filename in files:
             if filename.endswith('.png') or filename.endswith('.jpg'):
-                img_path = os.path.join(folder_path, filename)
-                try:
-                    img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-                    img = cv2.resize(img, (img_size, img_size))
-                    images.append(img)
-                    labels.append(label)
-                except Exception as e:
-                    print(f"Error loading {img_path}: {e}")
-    
-    # Convert to numpy arrays
-    images = np.array(images)
-    labels = np.array(labels)
+                paths.append(os.path.join(folder_path, filename))
+                path_labels.append(label)
+    
+    # Reuse the decoded dataset from a previous run if the inputs match
+    cache_key = f"{data_dir}|{img_size}|{','.join(folders)}|{len(paths)}"
+    images = None
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cache:
+            if str(cache['key']) == cache_key:
+                print(f"Using cached dataset from {cache_path}")
+                images, labels = cache['images'], cache['labels']
+    
+    if images is None:
+        images, labels = load_images(paths, path_labels)
+        np.savez(cache_path, key=cache_key, images=images, labels=labels)
     
     # Shuffle data
     indices = np.random.permutation(len(images))
@@ -170,7 +178,7 @@ def train_model(train_data, test_data, train_labels, test_labels, num_classes):
         Dense(64, activation='tanh', input_shape=(3600,)),
         Dense(64, activation='tanh'),
         Dense(64, activation='relu'),
-        Dense(num_classes, activation='softmax')
+        Dense(num_classes, activation='softmax', dtype='float32')  # Keep softmax in float32
     ])
     
     # Compile the model